@@ -4,6 +4,7 @@ Reconstruct the theoretical signal using d2.
 
 """
 import numpy as np
+from .gridsearch import spectrum_grid
 
 def theoretical_spectrum(lam_nm, n, s, d2_all_m):
     """
@@ -15,20 +16,10 @@ def theoretical_spectrum(lam_nm, n, s, d2_all_m):
     Return:
         T (array) : Theoretical transmittance (fraction in [0,1]).
     """
-    lam_m = lam_nm * 1e-9
     d_m = float(np.nanmean(d2_all_m))
 
-    #k = 0.0
-    x = 1.0  # transparent film
-    phi = 4.0 * np.pi * n * d_m / lam_m
-
-    A = 16.0 * s * (n**2)
-    B = ((n + 1)**2) * ((n + 1)*(n + s**2))
-    C = ( (n**2 - 1)*(n**2 - s**2) ) * 2*np.cos(phi)
-    D = ((n - 1)**2) * ((n - 1)*(n - s**2))
-
-    T = (A * x) / (B - C * x + D * x**2)
-    return np.clip(T, 0.0, 1.0)
+    #k = 0.0, x = 1.0 (transparent film)
+    return spectrum_grid(lam_nm, n, s, [d_m])[0]
 
 
 def fft_compare(lam_nm, T1, T2):
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Thickness grid search using the Swanepoel Appendix A1 spectrum (k=0).
+
+Scores measured spectra against many candidate thicknesses at once. Used as a
+robust initial guess when the Eq. 3 order search locks on to the wrong fringe
+order.
+"""
+import numpy as np
+
+
+def spectrum_terms(n, s):
+    """
+    d-independent terms of Swanepoel Appendix A1 with k=0 (x = 1).
+
+    Input:
+        n (array) : n(λ) - refractive index dependent on lambda.
+        s (array) : Substrate refractive index at the same wavelengths.
+    Return:
+        A (array) : Numerator 16 s n^2
+        BD (array) : B + D (constant part of the denominator)
+        C0 (array) : Amplitude of the cos(phi) term, C = C0 cos(phi)
+    """
+    n = np.asarray(n, float)
+    s = np.asarray(s, float)
+
+    A = 16.0 * s * (n**2)
+    B = ((n + 1)**2) * ((n + 1)*(n + s**2))
+    C0 = ((n**2 - 1)*(n**2 - s**2)) * 2
+    D = ((n - 1)**2) * ((n - 1)*(n - s**2))
+
+    return A, B + D, C0
+
+
+def spectrum_grid(lam_nm, n, s, d_grid_m):
+    """
+    Theoretical T(λ) for every candidate thickness, shape (n_thickness, n_lambda).
+
+    Input:
+        lam_nm (array) : Wavelength (nm).
+        n (array) : n(λ) - refractive index dependent on lambda.
+        s (array) : Substrate refractive index at the same wavelengths.
+        d_grid_m (array) : Candidate thicknesses (m).
+    Return:
+        T (array) : Theoretical transmittance (fraction in [0,1]).
+    """
+    A, BD, C0 = spectrum_terms(n, s)
+    k = 4.0 * np.pi * np.asarray(n, float) / (np.asarray(lam_nm, float) * 1e-9)
+    return _model_block(np.asarray(d_grid_m, float), k, A, BD, C0)
+
+
+def _model_block(d_m, k, A, BD, C0):
+    # phi = 4πnd/λ = k*d for a block of candidates
+    phi = np.multiply.outer(d_m, k)
+    np.cos(phi, out=phi)
+    phi *= -C0
+    phi += BD
+    np.divide(A, phi, out=phi)
+    return np.clip(phi, 0.0, 1.0, out=phi)
+
+
+def thickness_grid_search(lam_nm, T, n, s, d_grid_m, block_size=256):
+    """
+    Score measured spectra against a grid of candidate thicknesses.
+
+    The cost is the sum of squared residuals between measured and theoretical
+    transmittance over the band. Candidates are evaluated in blocks of
+    block_size so memory stays bounded at (block_size, n_lambda) per block,
+    independent of the grid size. A spectrum whose cost is not finite for any
+    candidate (e.g. NaN in T or n) gets d_best_m = NaN.
+
+    Input:
+        lam_nm (array) : Wavelength (nm), shape (n_lambda,).
+        T (array) : Measured transmittance (fraction in [0,1]), shape
+                    (n_lambda,) or (n_spectra, n_lambda).
+        n (array) : n(λ), shape (n_lambda,) shared by all spectra or
+                    (n_spectra, n_lambda) per spectrum.
+        s (array) : Substrate refractive index, shape (n_lambda,).
+        d_grid_m (array) : Candidate thicknesses (m), shape (n_thickness,).
+        block_size (int) : Number of candidate thicknesses per block.
+    Return:
+        dict with:
+        "d_best_m" : float, or array (n_spectra,) for batched input
+        "cost" : array (n_thickness,), or (n_spectra, n_thickness)
+        "d_grid_m" : array (n_thickness,)
+    """
+    lam_nm = np.asarray(lam_nm, float)
+    d_grid_m = np.asarray(d_grid_m, float).reshape(-1)
+    T = np.asarray(T, float)
+    n = np.asarray(n, float)
+    s = np.broadcast_to(np.asarray(s, float), lam_nm.shape)
+
+    single = T.ndim == 1
+    T = np.atleast_2d(T)
+    if T.shape[1] != lam_nm.size:
+        raise ValueError("T must have n_lambda columns matching lam_nm")
+    if block_size < 1:
+        raise ValueError("block_size must be >= 1")
+    if d_grid_m.size == 0:
+        raise ValueError("d_grid_m must contain at least one thickness")
+
+    cost = np.empty((T.shape[0], d_grid_m.size))
+
+    if n.ndim == 1:
+        # Shared n(λ): one model block serves every spectrum.
+        # |T - M|^2 = |T|^2 - 2 T.M + |M|^2, so each block is a single matmul.
+        A, BD, C0 = spectrum_terms(n, s)
+        k = 4.0 * np.pi * n / (lam_nm * 1e-9)
+        T_sq = np.einsum("ij,ij->i", T, T)
+        for i0 in range(0, d_grid_m.size, block_size):
+            i1 = min(i0 + block_size, d_grid_m.size)
+            M = _model_block(d_grid_m[i0:i1], k, A, BD, C0)
+            M_sq = np.einsum("ij,ij->i", M, M)
+            blk = cost[:, i0:i1]
+            np.subtract(T_sq[:, None], 2.0 * (T @ M.T), out=blk)
+            blk += M_sq[None, :]
+            # The expanded form cancels to slightly below zero (~1e-13) near
+            # an exact match; clamp so both branches return a cost >= 0.
+            np.maximum(blk, 0.0, out=blk)
+    else:
+        if n.shape != T.shape:
+            raise ValueError("Per-spectrum n must have the same shape as T")
+        for j in range(T.shape[0]):
+            A, BD, C0 = spectrum_terms(n[j], s)
+            k = 4.0 * np.pi * n[j] / (lam_nm * 1e-9)
+            for i0 in range(0, d_grid_m.size, block_size):
+                i1 = min(i0 + block_size, d_grid_m.size)
+                M = _model_block(d_grid_m[i0:i1], k, A, BD, C0)
+                M -= T[j]
+                cost[j, i0:i1] = np.einsum("ij,ij->i", M, M)
+
+    finite = np.isfinite(cost)
+    best_idx = np.argmin(np.where(finite, cost, np.inf), axis=1)
+    d_best = np.where(finite.any(axis=1), d_grid_m[best_idx], np.nan)
+
+    if single:
+        return {"d_best_m": float(d_best[0]), "cost": cost[0], "d_grid_m": d_grid_m}
+    return {"d_best_m": d_best, "cost": cost, "d_grid_m": d_grid_m}
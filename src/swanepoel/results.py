@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Append run_swanepoel results to a partitioned Parquet dataset and query it
+without loading it into memory. Requires pyarrow ("pip install .[parquet]").
+"""
+import datetime
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+RESULT_SCHEMA = pa.schema([
+    ("sample", pa.string()),
+    ("date", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("source", pa.string()),
+    ("mean_m", pa.float64()),
+    ("std_m", pa.float64()),
+    ("ci95_low_m", pa.float64()),
+    ("ci95_high_m", pa.float64()),
+    ("n_extrema", pa.int32()),
+    ("d2_all_m", pa.list_(pa.float64())),
+    ("n_peaks", pa.list_(pa.float64())),
+    ("lam_peaks_nm", pa.list_(pa.float64())),
+])
+
+_LIST_COLUMNS = ("d2_all_m", "n_peaks", "lam_peaks_nm")
+
+# Written by compact() in a partition while its old files are being removed
+_COMPACT_MARKER = "_compact.json"
+
+
+class ResultWriter:
+    """
+    Buffered writer appending results to a hive-partitioned Parquet dataset.
+
+    Rows are held in memory and written as one file per partition each time
+    batch_rows results have been appended (and on close), so a run produces
+    a few large row groups instead of one file per measurement. Existing files
+    under root are never touched, so several runs append to the same dataset.
+
+    Every flush adds one file to each partition it touches, so with many
+    samples per batch, or many short runs, partitions accumulate small files.
+    Run compact(root) periodically to rewrite each partition into one file
+    with large row groups.
+
+    Input:
+        root (string) : Dataset directory
+        partition_by (string) : "sample" or "date"
+        batch_rows (int) : Number of results buffered before writing
+    """
+    def __init__(self, root, partition_by="sample", batch_rows=10000):
+        if partition_by not in ("sample", "date"):
+            raise ValueError(f'Unknown partition_by "{partition_by}"')
+        self.root = root
+        self.partition_by = partition_by
+        self.batch_rows = batch_rows
+        self._rows = {name: [] for name in RESULT_SCHEMA.names}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._rows["sample"])
+
+    def append(self, result, sample, timestamp=None, source=None):
+        """
+        Buffer one run_swanepoel result.
+
+        Input:
+            result (dict) : Output of run_swanepoel
+            sample (string) : Sample identifier
+            timestamp (datetime) : Measurement time, defaults to now
+            source (string) : Optional origin, e.g. the spectrum file name
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        stats = result["summary"]
+        row = {
+            "sample": sample,
+            "date": timestamp.date().isoformat(),
+            "timestamp": timestamp,
+            "source": source,
+            "mean_m": float(stats["mean_m"]),
+            "std_m": float(stats["std_m"]),
+            "ci95_low_m": float(stats["CI95"][0]),
+            "ci95_high_m": float(stats["CI95"][1]),
+            "n_extrema": len(result["d2_all_m"]),
+        }
+        for name in _LIST_COLUMNS:
+            row[name] = np.asarray(result[name], float).tolist()
+
+        for name, val in row.items():
+            self._rows[name].append(val)
+        if len(self) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered rows to the dataset.
+        """
+        if len(self) == 0:
+            return
+        table = pa.Table.from_pydict(self._rows, schema=RESULT_SCHEMA)
+        ds.write_dataset(
+            table, self.root, format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([RESULT_SCHEMA.field(self.partition_by)]),
+                flavor="hive"),
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            max_rows_per_group=max(self.batch_rows, len(self)),
+        )
+        self._rows = {name: [] for name in RESULT_SCHEMA.names}
+
+    def close(self):
+        self.flush()
+
+
+def _data_files(dirpath, filenames):
+    return sorted(os.path.join(dirpath, f) for f in filenames
+                  if f.endswith(".parquet") and not f.startswith(("_", ".")))
+
+
+def _superseded(dirpath):
+    """
+    Files an interrupted compact() already replaced, or an empty set.
+
+    The marker lists the compacted file and the files it replaces. Once the
+    compacted file exists the listed files are duplicates, whether or not
+    they have been deleted yet.
+    """
+    marker = os.path.join(dirpath, _COMPACT_MARKER)
+    if not os.path.exists(marker):
+        return set()
+    with open(marker) as f:
+        info = json.load(f)
+    if not os.path.exists(os.path.join(dirpath, info["new"])):
+        return set()
+    return {os.path.join(dirpath, name) for name in info["old"]}
+
+
+def _finish_compact(dirpath):
+    # Complete or roll back a compact() interrupted in this partition
+    for f in _superseded(dirpath):
+        if os.path.exists(f):
+            os.remove(f)
+    for f in os.listdir(dirpath):
+        if f.startswith("_compact-") or f == _COMPACT_MARKER + ".tmp":
+            os.remove(os.path.join(dirpath, f))
+    marker = os.path.join(dirpath, _COMPACT_MARKER)
+    if os.path.exists(marker):
+        os.remove(marker)
+
+
+def compact(root, row_group_size=100000):
+    """
+    Rewrite every partition of a result dataset into a single file with large
+    row groups. Partitions are streamed one at a time, so memory is bounded
+    by row_group_size rows. Do not run while a ResultWriter is flushing into
+    root.
+
+    Before the compacted file is moved into place, a marker listing the files
+    it replaces is written to the partition. If the process dies before the
+    old files are removed, open_results() skips them (no double counting) and
+    the next compact() finishes the cleanup.
+
+    Input:
+        root (string) : Dataset directory
+        row_group_size (int) : Rows per row group in the compacted files
+    Return:
+        n_removed (int) : Number of files replaced
+    """
+    n_removed = 0
+    for dirpath, _, _ in os.walk(root):
+        _finish_compact(dirpath)
+        files = _data_files(dirpath, os.listdir(dirpath))
+        if len(files) < 2:
+            continue
+
+        part = ds.dataset(files, format="parquet")
+        tmp = os.path.join(dirpath, f"_compact-{uuid.uuid4().hex}.parquet")
+        buf, n_buf = [], 0
+        with pq.ParquetWriter(tmp, part.schema) as writer:
+            for batch in part.to_batches(batch_size=row_group_size):
+                buf.append(batch)
+                n_buf += batch.num_rows
+                if n_buf >= row_group_size:
+                    writer.write_table(pa.Table.from_batches(buf, part.schema),
+                                       row_group_size=row_group_size)
+                    buf, n_buf = [], 0
+            if buf:
+                writer.write_table(pa.Table.from_batches(buf, part.schema),
+                                   row_group_size=row_group_size)
+
+        new = f"part-{uuid.uuid4().hex}-0.parquet"
+        marker = os.path.join(dirpath, _COMPACT_MARKER)
+        with open(marker + ".tmp", "w") as f:
+            json.dump({"new": new,
+                       "old": [os.path.basename(f) for f in files]}, f)
+        os.replace(marker + ".tmp", marker)
+
+        os.replace(tmp, os.path.join(dirpath, new))
+        for f in files:
+            os.remove(f)
+        os.remove(marker)
+        n_removed += len(files)
+    return n_removed
+
+
+def open_results(root):
+    """
+    Open a result dataset lazily. Works for either partitioning, and skips
+    files left behind by an interrupted compact().
+
+    Input:
+        root (string) : Dataset directory
+    Return:
+        dataset (pyarrow.dataset.Dataset)
+    """
+    stale, files = set(), []
+    for dirpath, _, filenames in os.walk(root):
+        if _COMPACT_MARKER in filenames:
+            stale |= _superseded(dirpath)
+        files += _data_files(dirpath, filenames)
+    if not stale:
+        return ds.dataset(root, format="parquet", schema=RESULT_SCHEMA,
+                          partitioning="hive")
+    return ds.dataset([f for f in files if f not in stale], format="parquet",
+                      schema=RESULT_SCHEMA, partitioning="hive",
+                      partition_base_dir=root)
+
+
+def scan_results(root, columns=None, filter=None, batch_size=65536):
+    """
+    Stream matching rows as record batches.
+
+    Input:
+        root (string) : Dataset directory
+        columns (list) : Columns to read, defaults to all
+        filter (pyarrow.compute.Expression) : Row filter, e.g.
+            ds.field("sample") == "Square1_SpotA"
+        batch_size (int) : Maximum rows per batch
+    Return:
+        iterator of pyarrow.RecordBatch
+    """
+    return open_results(root).to_batches(columns=columns, filter=filter,
+                                         batch_size=batch_size)
+
+
+def _batch_moments(table, by, column):
+    # Per-group count, mean, M2, min, max of one table with pyarrow
+    col = table[column]
+    keep = pc.fill_null(pc.invert(pc.is_nan(col)), False)
+    table = table.filter(keep)
+    agg = table.group_by(by).aggregate([
+        (column, "count"), (column, "mean"), (column, "variance"),
+        (column, "min"), (column, "max")])
+    count = agg[f"{column}_count"].to_numpy().astype(float)
+    keys = list(zip(*[agg[k].to_pylist() for k in by]))
+    return keys, {
+        "count": count,
+        "mean": agg[f"{column}_mean"].to_numpy(),
+        "m2": agg[f"{column}_variance"].to_numpy() * count,
+        "min": agg[f"{column}_min"].to_numpy(),
+        "max": agg[f"{column}_max"].to_numpy(),
+    }
+
+
+def aggregate_results(root, column="mean_m", by="sample", filter=None,
+                      batch_size=65536):
+    """
+    Per-group count, mean, std, min and max of a scalar column.
+
+    Record batches are gathered up to batch_size rows, grouped with pyarrow
+    and merged into one running per-group accumulator using the pairwise
+    (Chan et al.) update of count, mean and M2. Memory is bounded by
+    batch_size plus the number of groups.
+
+    Input:
+        root (string) : Dataset directory
+        column (string) : Scalar column to aggregate
+        by (string or list) : Grouping column(s)
+        filter (pyarrow.compute.Expression) : Row filter
+        batch_size (int) : Maximum rows per batch
+    Return:
+        DataFrame indexed by group with count, mean, std, min, max
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    names = ("count", "mean", "m2", "min", "max")
+
+    index = {}                           # group key -> row in acc
+    acc = {name: np.zeros(0) for name in names}
+
+    def merge(table):
+        keys, b = _batch_moments(table, by, column)
+        new = [k for k in keys if k not in index]
+        if new:
+            base = len(index)
+            index.update((k, base + i) for i, k in enumerate(new))
+            acc["count"] = np.concatenate([acc["count"], np.zeros(len(new))])
+            acc["mean"] = np.concatenate([acc["mean"], np.zeros(len(new))])
+            acc["m2"] = np.concatenate([acc["m2"], np.zeros(len(new))])
+            acc["min"] = np.concatenate([acc["min"], np.full(len(new), np.inf)])
+            acc["max"] = np.concatenate([acc["max"], np.full(len(new), -np.inf)])
+        rows = np.fromiter((index[k] for k in keys), int, len(keys))
+
+        na, nb = acc["count"][rows], b["count"]
+        n = na + nb
+        w = np.divide(nb, n, out=np.zeros_like(n), where=n > 0)
+        delta = np.nan_to_num(b["mean"] - acc["mean"][rows])
+        acc["mean"][rows] += delta * w
+        acc["m2"][rows] += np.nan_to_num(b["m2"]) + delta**2 * na * w
+        acc["count"][rows] = n
+        acc["min"][rows] = np.minimum(acc["min"][rows], b["min"])
+        acc["max"][rows] = np.maximum(acc["max"][rows], b["max"])
+
+    buf, n_buf = [], 0
+    for batch in scan_results(root, columns=by + [column], filter=filter,
+                              batch_size=batch_size):
+        buf.append(batch)
+        n_buf += batch.num_rows
+        if n_buf >= batch_size:
+            merge(pa.Table.from_batches(buf))
+            buf, n_buf = [], 0
+    if buf:
+        merge(pa.Table.from_batches(buf))
+
+    keep = acc["count"] > 0
+    if not keep.any():
+        return pd.DataFrame(columns=["count", "mean", "std", "min", "max"])
+
+    keys = [k for k, i in sorted(index.items(), key=lambda kv: kv[1])]
+    if len(by) == 1:
+        idx = pd.Index([k[0] for k in keys], name=by[0])
+    else:
+        idx = pd.MultiIndex.from_tuples(keys, names=by)
+    # Population std, as in summarize_thickness
+    out = pd.DataFrame({"count": acc["count"].astype(int), "mean": acc["mean"],
+                        "std": np.sqrt(acc["m2"] / acc["count"]),
+                        "min": acc["min"], "max": acc["max"]}, index=idx)
+    return out[keep].sort_index()
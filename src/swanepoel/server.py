@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Long-lived local analysis service.
+
+Keeps the package imported and a worker pool running so acquisition software
+can POST spectra and get the run_swanepoel summary back as JSON, instead of
+starting a new Python process per measurement.
+
+Run from ThicknessCalculator folder:
+    python -m swanepoel.server --port 8765
+
+Endpoints:
+    POST /analyze : one request object, or a list of them (batch)
+    GET  /stats   : request count and latency percentiles (ms)
+    GET  /health  : {"status": "ok"}
+
+A request object holds either "path" (spectrum csv readable by the server) or
+"lam_nm" and "T" (T as fraction in [0,1]), plus optional overrides of the
+pipeline settings: lam_min, lam_max, min_sep_nm, window_size,
+substrate_model, substrate_coeffs.
+
+A single request answers 400 for bad input and 500 if the pipeline fails.
+A batch always answers 200 with one result or {"error": ...} per item.
+Non-finite numbers (e.g. NaN thickness) are returned as null.
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .io import load_spectrum_csv
+from .pipeline import run_swanepoel
+from .optics import substrate_refractive_index
+from .gridsearch import spectrum_grid
+
+DEFAULT_SETTINGS = {
+    "lam_min": 600,
+    "lam_max": 900,
+    "min_sep_nm": 2.0,
+    "window_size": 5,
+    "substrate_model": "cauchy",
+    "substrate_coeffs": (1.5690, 0.00531),
+}
+
+
+# Number of coefficients per substrate model (see substrate_refractive_index)
+_SUBSTRATE_COEFFS = {"sellmeier": 6, "cauchy": 2, "cauchy_alt": 3,
+                     "const": 1, "constant": 1}
+
+
+class BadRequest(ValueError):
+    """
+    Request object that cannot be turned into a spectrum.
+    """
+
+
+def _finite(x):
+    x = float(x)
+    return x if math.isfinite(x) else None
+
+
+def summary_to_json(result):
+    """
+    Convert the run_swanepoel output to a JSON-serialisable summary.
+
+    Input:
+        result (dict) : Output of run_swanepoel
+    Return:
+        dict with "mean_m", "std_m", "CI95" and "n_extrema"
+    """
+    stats = result["summary"]
+    return {
+        "mean_m": _finite(stats["mean_m"]),
+        "std_m": _finite(stats["std_m"]),
+        "CI95": [_finite(stats["CI95"][0]), _finite(stats["CI95"][1])],
+        "n_extrema": int(len(result["d2_all_m"])),
+    }
+
+
+def _check_settings(kw):
+    # Validate client overrides so bad input answers 400, not a pipeline 500
+    try:
+        for key in ("lam_min", "lam_max", "min_sep_nm"):
+            kw[key] = float(kw[key])
+            if not math.isfinite(kw[key]):
+                raise ValueError(f"{key} must be finite")
+        window = kw["window_size"]
+        if isinstance(window, float) and not window.is_integer():
+            raise ValueError("window_size must be an integer")
+        kw["window_size"] = int(window)
+        if kw["window_size"] < 1:
+            raise ValueError("window_size must be >= 1")
+        if kw["lam_min"] >= kw["lam_max"]:
+            raise ValueError("lam_min must be below lam_max")
+
+        model = kw["substrate_model"]
+        if not isinstance(model, str) or model.lower() not in _SUBSTRATE_COEFFS:
+            raise ValueError(f"substrate_model must be one of "
+                             f"{sorted(_SUBSTRATE_COEFFS)}")
+        coeffs = np.asarray(kw["substrate_coeffs"], float).reshape(-1)
+        if coeffs.size != _SUBSTRATE_COEFFS[model.lower()]:
+            raise ValueError(f'substrate_coeffs for "{model}" must have '
+                             f"{_SUBSTRATE_COEFFS[model.lower()]} values")
+        if not np.all(np.isfinite(coeffs)):
+            raise ValueError("substrate_coeffs must be finite")
+        kw["substrate_coeffs"] = tuple(coeffs)
+    except (TypeError, ValueError) as e:
+        raise BadRequest(f"{type(e).__name__}: {e}") from e
+    return kw
+
+
+def parse_request(req, settings=DEFAULT_SETTINGS):
+    """
+    Load the spectrum and pipeline settings for one request object.
+
+    Input:
+        req (dict) : Request with "path" or "lam_nm" + "T", and optional
+                     setting overrides
+        settings (dict) : Default pipeline settings
+    Return:
+        lam (array) : Wavelength (nm)
+        T (array) : Transmittance (fraction in [0,1])
+        kw (dict) : Keyword arguments for run_swanepoel
+    Raises:
+        BadRequest : If the request is malformed or the file cannot be read
+    """
+    if not isinstance(req, dict):
+        raise BadRequest("request must be a JSON object")
+    try:
+        if "path" in req:
+            lam, T = load_spectrum_csv(req["path"])
+        else:
+            lam = np.asarray(req["lam_nm"], float)
+            T = np.asarray(req["T"], float)
+    except KeyError as e:
+        raise BadRequest(f"missing field {e}") from e
+    except (OSError, TypeError, ValueError) as e:
+        raise BadRequest(f"{type(e).__name__}: {e}") from e
+
+    if lam.ndim != 1 or lam.shape != T.shape:
+        raise BadRequest("lam_nm and T must be 1-D arrays of equal length")
+
+    kw = {key: req.get(key, val) for key, val in settings.items()}
+    return lam, T, _check_settings(kw)
+
+
+def analyze_request(req, settings=DEFAULT_SETTINGS):
+    """
+    Run the pipeline for one request object.
+
+    Input:
+        req (dict) : Request with "path" or "lam_nm" + "T", and optional
+                     setting overrides
+        settings (dict) : Default pipeline settings
+    Return:
+        dict : summary_to_json output
+    Raises:
+        BadRequest : If the request is malformed
+        Exception : Any pipeline failure is propagated
+    """
+    lam, T, kw = parse_request(req, settings)
+    return summary_to_json(run_swanepoel(lam, T, **kw))
+
+
+class LatencyStats:
+    """
+    Thread-safe ring buffer of latencies.
+    """
+    def __init__(self, maxlen=10000):
+        self._lat = deque(maxlen=maxlen)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._lat.append(seconds)
+            self._count += 1
+
+    def report(self):
+        with self._lock:
+            lat_ms = np.array(self._lat) * 1e3
+            count = self._count
+        if lat_ms.size == 0:
+            return {"count": count}
+        p50, p90, p99 = np.percentile(lat_ms, [50, 90, 99])
+        return {"count": count, "window": int(lat_ms.size),
+                "p50_ms": float(p50), "p90_ms": float(p90),
+                "p99_ms": float(p99), "max_ms": float(lat_ms.max())}
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """
+    Localhost HTTP server dispatching analysis requests to a worker pool.
+
+    Two latencies are tracked: "request" is the turnaround of each POST
+    from receipt to response written (including body parsing, queueing in
+    the pool and JSON encoding); "service" is the pipeline time per item.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8765, workers=4, settings=None):
+        super().__init__((host, port), _Handler)
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.request_stats = LatencyStats()
+        self.service_stats = LatencyStats()
+
+    def _timed(self, req):
+        t0 = time.perf_counter()
+        try:
+            return analyze_request(req, self.settings)
+        finally:
+            self.service_stats.add(time.perf_counter() - t0)
+
+    def _batch_item(self, req):
+        try:
+            return self._timed(req)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    def analyze(self, payload):
+        """
+        Return (status, body) for a single request object or a batch.
+        """
+        if isinstance(payload, list):
+            return 200, list(self.pool.map(self._batch_item, payload))
+        try:
+            return 200, self.pool.submit(self._timed, payload).result()
+        except BadRequest as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    def stats_report(self):
+        return {"request": self.request_stats.report(),
+                "service": self.service_stats.report()}
+
+    def warmup(self):
+        """
+        Run the pipeline once on a synthetic spectrum so first-call costs
+        (lazy imports, scipy.stats setup) are paid before serving. Raises if
+        the pipeline is broken.
+        """
+        lam = np.linspace(400.0, 1000.0, 450)
+        s = substrate_refractive_index(lam, "cauchy", (1.5690, 0.00531))
+        n = np.full_like(lam, 2.0)
+        T = spectrum_grid(lam, n, s, [5e-6])[0]
+        run_swanepoel(lam, T, **self.settings)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle enabled the body
+    # waits for the client's delayed ACK (~40 ms) on keep-alive connections.
+    disable_nagle_algorithm = True
+
+    def _send_json(self, obj, code=200, close=False):
+        body = json.dumps(obj, allow_nan=False).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if close:
+            # Body was not read, so the connection cannot be reused
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(self.server.stats_report())
+        elif self.path == "/health":
+            self._send_json({"status": "ok"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        t0 = time.perf_counter()
+        try:
+            length = self.headers.get("Content-Length")
+            if length is None:
+                self._send_json({"error": "Content-Length required"}, 411,
+                                close=True)
+                return
+            try:
+                length = int(length)
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                self._send_json({"error": "invalid Content-Length"}, 400,
+                                close=True)
+                return
+            body = self.rfile.read(length)
+            if self.path != "/analyze":
+                self._send_json({"error": "not found"}, 404)
+                return
+            try:
+                payload = json.loads(body)
+            except ValueError as e:
+                self._send_json({"error": f"bad request: {e}"}, 400)
+                return
+            code, out = self.server.analyze(payload)
+            self._send_json(out, code)
+        finally:
+            self.server.request_stats.add(time.perf_counter() - t0)
+
+    def log_message(self, format, *args):
+        pass  # keep the request path quiet
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Swanepoel analysis server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    server = AnalysisServer(args.host, args.port, args.workers)
+    server.warmup()
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -84,14 +84,11 @@ def thickness_estimate(lam_peaks_nm, n_peaks,
             m_trial[0] = m_start + 0.5
 
         # ---- Assign subsequent m-values by following m_raw downwards ----
-        for i in range(1, len(m_raw)):
-            # expected m from d1 ratio:
-            m_expected = m_raw[i] - m_raw[0] + m_trial[0]
-
-            if type_flag[i] == 1:   # peak: nearest integer
-                m_trial[i] = np.round(m_expected)
-            else:                   # valley: nearest half-integer
-                m_trial[i] = np.round(m_expected - 0.5) + 0.5
+        # expected m from d1 ratio:
+        m_expected = m_raw[1:] - m_raw[0] + m_trial[0]
+        m_trial[1:] = np.where(type_flag[1:] == 1,
+                               np.round(m_expected),             # peak: nearest integer
+                               np.round(m_expected - 0.5) + 0.5) # valley: nearest half-integer
 
         # Compute d_i from eq. (3)
         d_i = m_trial * lam_all_m / (2 * n_all)
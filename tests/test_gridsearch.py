@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from swanepoel.frequency import theoretical_spectrum
+from swanepoel.gridsearch import spectrum_grid, thickness_grid_search
+from swanepoel.optics import substrate_refractive_index
+
+
+def _band():
+    lam = np.linspace(600.0, 900.0, 226)
+    s = substrate_refractive_index(lam, "cauchy", (1.5690, 0.00531))
+    n = 2.2 + 0.05 * (750.0 / lam)**2
+    return lam, n, s
+
+
+def _a1_reference(lam_nm, n, s, d_m):
+    # Closed-form Swanepoel Appendix A1 (k=0, x=1) as originally written
+    lam_m = lam_nm * 1e-9
+    x = 1.0
+    phi = 4.0 * np.pi * n * d_m / lam_m
+    A = 16.0 * s * (n**2)
+    B = ((n + 1)**2) * ((n + 1)*(n + s**2))
+    C = ((n**2 - 1)*(n**2 - s**2)) * 2*np.cos(phi)
+    D = ((n - 1)**2) * ((n - 1)*(n - s**2))
+    T = (A * x) / (B - C * x + D * x**2)
+    return np.clip(T, 0.0, 1.0)
+
+
+def test_spectrum_grid_matches_closed_form():
+    lam, n, s = _band()
+    d_grid = np.array([5e-6, 1.2e-5, 1.82e-5])
+    T_grid = spectrum_grid(lam, n, s, d_grid)
+    assert T_grid.shape == (3, lam.size)
+    for d, T in zip(d_grid, T_grid):
+        expected = _a1_reference(lam, n, s, d)
+        np.testing.assert_allclose(T, expected, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(theoretical_spectrum(lam, n, s, [d]),
+                                   expected, rtol=0, atol=1e-12)
+
+
+def test_grid_search_recovers_thickness():
+    lam, n, s = _band()
+    d_grid = np.linspace(1.7e-5, 1.9e-5, 401)
+    d_true = d_grid[137]
+    T = theoretical_spectrum(lam, n, s, [d_true])
+    out = thickness_grid_search(lam, T, n, s, d_grid, block_size=64)
+    assert out["d_best_m"] == d_true
+    assert out["cost"].shape == d_grid.shape
+    assert np.all(out["cost"] >= 0.0)
+
+
+def test_shared_and_per_spectrum_paths_agree():
+    lam, n, s = _band()
+    d_grid = np.linspace(1.7e-5, 1.9e-5, 301)
+    rng = np.random.default_rng(0)
+    T = np.stack([theoretical_spectrum(lam, n, s, [d]) for d in (1.75e-5, 1.85e-5)])
+    T += rng.normal(0.0, 1e-3, T.shape)
+
+    shared = thickness_grid_search(lam, T, n, s, d_grid, block_size=50)
+    per = thickness_grid_search(lam, T, np.stack([n, n]), s, d_grid, block_size=50)
+
+    np.testing.assert_array_equal(shared["d_best_m"], per["d_best_m"])
+    np.testing.assert_allclose(shared["cost"], per["cost"], rtol=1e-9, atol=1e-12)
+    assert np.all(shared["cost"] >= 0.0)
+
+
+def test_non_finite_spectrum_gives_nan_thickness():
+    lam, n, s = _band()
+    d_grid = np.linspace(1.7e-5, 1.9e-5, 101)
+    T_good = theoretical_spectrum(lam, n, s, [d_grid[40]])
+    T_bad = T_good.copy()
+    T_bad[10] = np.nan
+
+    single = thickness_grid_search(lam, T_bad, n, s, d_grid)
+    assert np.isnan(single["d_best_m"])
+
+    batch = thickness_grid_search(lam, np.stack([T_good, T_bad]), n, s, d_grid)
+    assert batch["d_best_m"][0] == d_grid[40]
+    assert np.isnan(batch["d_best_m"][1])
+
+
+def test_empty_grid_rejected():
+    lam, n, s = _band()
+    with pytest.raises(ValueError, match="d_grid_m"):
+        thickness_grid_search(lam, np.full(lam.size, 0.5), n, s, [])
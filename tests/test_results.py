@@ -0,0 +1,122 @@
+import datetime
+import glob
+import os
+
+import numpy as np
+import pytest
+
+ds = pytest.importorskip("pyarrow.dataset")
+
+import swanepoel.results
+from swanepoel.results import (ResultWriter, aggregate_results, compact,
+                               open_results)
+
+
+def _result(mean, n_extrema=3):
+    return {"summary": {"mean_m": mean, "std_m": 1e-8,
+                        "CI95": (mean - 1e-8, mean + 1e-8)},
+            "d2_all_m": np.full(n_extrema, mean),
+            "n_peaks": np.linspace(2.0, 2.5, n_extrema),
+            "lam_peaks_nm": np.linspace(600.0, 900.0, n_extrema)}
+
+
+def _write(root, partition_by, rows, batch_rows=7):
+    with ResultWriter(root, partition_by=partition_by, batch_rows=batch_rows) as w:
+        for sample, day, mean in rows:
+            w.append(_result(mean), sample,
+                     timestamp=datetime.datetime(2026, 1, day, 12))
+
+
+def _rows(seed, n=40):
+    rng = np.random.default_rng(seed)
+    return [(f"S{i % 3}", 1 + i % 4, 1.8e-5 + rng.normal(0.0, 5e-8))
+            for i in range(n)]
+
+
+@pytest.mark.parametrize("partition_by", ["sample", "date"])
+def test_round_trip_and_append(tmp_path, partition_by):
+    root = str(tmp_path / "res")
+    rows = _rows(0) + _rows(1)
+    _write(root, partition_by, rows[:40])
+    _write(root, partition_by, rows[40:])   # second run appends
+
+    dirs = sorted(os.listdir(root))
+    assert all(d.startswith(partition_by + "=") for d in dirs)
+
+    table = open_results(root).to_table(filter=ds.field("sample") == "S1")
+    assert table.num_rows == sum(r[0] == "S1" for r in rows)
+    row = table.slice(0, 1).to_pylist()[0]
+    assert row["lam_peaks_nm"] == [600.0, 750.0, 900.0]
+    assert row["n_extrema"] == 3
+
+    agg = aggregate_results(root, by=partition_by, batch_size=5)
+    key = 1 if partition_by == "sample" else 3
+    vals = np.array([r[2] for r in rows])
+    groups = np.array([r[0] if partition_by == "sample" else f"2026-01-0{r[1]}"
+                       for r in rows])
+    name = sorted(set(groups))[key]
+    sel = vals[groups == name]
+    assert agg.loc[name, "count"] == sel.size
+    np.testing.assert_allclose(agg.loc[name, "mean"], sel.mean(), rtol=1e-12)
+    np.testing.assert_allclose(agg.loc[name, "std"], sel.std(), rtol=1e-9)
+    assert agg.loc[name, "min"] == sel.min()
+    assert agg.loc[name, "max"] == sel.max()
+
+
+def test_aggregate_filter_and_multi_key(tmp_path):
+    root = str(tmp_path / "res")
+    rows = _rows(2)
+    _write(root, "sample", rows)
+    agg = aggregate_results(root, by=["date", "sample"],
+                            filter=ds.field("sample") == "S0")
+    assert set(agg.index.get_level_values("sample")) == {"S0"}
+    assert agg["count"].sum() == sum(r[0] == "S0" for r in rows)
+
+
+def test_aggregate_std_precision(tmp_path):
+    # Small spread on a large offset: naive sumsq/count - mean^2 cancels badly
+    root = str(tmp_path / "res")
+    rng = np.random.default_rng(3)
+    vals = 1.0 + rng.normal(0.0, 1e-9, 200)
+    _write(root, "sample", [("S0", 1, v) for v in vals], batch_rows=50)
+    agg = aggregate_results(root, batch_size=17)
+    np.testing.assert_allclose(agg.loc["S0", "std"], vals.std(), rtol=1e-6)
+
+
+def test_compact(tmp_path):
+    root = str(tmp_path / "res")
+    rows = _rows(4)
+    _write(root, "sample", rows, batch_rows=3)
+    before = open_results(root).to_table().sort_by("mean_m")
+    assert len(glob.glob(os.path.join(root, "sample=S0", "*.parquet"))) > 1
+
+    assert compact(root) > 0
+    for d in os.listdir(root):
+        assert len(glob.glob(os.path.join(root, d, "*.parquet"))) == 1
+    after = open_results(root).to_table().sort_by("mean_m")
+    assert after.equals(before)
+
+
+def test_interrupted_compact_does_not_double_count(tmp_path, monkeypatch):
+    root = str(tmp_path / "res")
+    rows = _rows(5)
+    _write(root, "sample", rows, batch_rows=3)
+    before = open_results(root).to_table().sort_by("mean_m")
+
+    def crash(path):
+        raise OSError("simulated crash")
+
+    # Die after the compacted file is in place, before old files are removed
+    monkeypatch.setattr(swanepoel.results.os, "remove", crash)
+    with pytest.raises(OSError):
+        compact(root)
+    monkeypatch.undo()
+
+    assert open_results(root).to_table().sort_by("mean_m").equals(before)
+    assert aggregate_results(root)["count"].sum() == len(rows)
+
+    compact(root)
+    for d in os.listdir(root):
+        assert os.listdir(os.path.join(root, d)) != []
+        assert len(glob.glob(os.path.join(root, d, "*"))) == 1
+    assert open_results(root).to_table().sort_by("mean_m").equals(before)
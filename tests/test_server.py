@@ -0,0 +1,130 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from swanepoel.io import load_spectrum_csv
+from swanepoel.server import AnalysisServer, summary_to_json
+
+DATA = os.path.join(os.path.dirname(__file__), os.pardir, "data",
+                    "GT-Thickness", "Square1_SpotA_Rep1.csv")
+
+
+@pytest.fixture(scope="module")
+def server():
+    srv = AnalysisServer(port=0, workers=2)
+    srv.warmup()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % srv.server_address[1]
+    srv.shutdown()
+    srv.server_close()
+
+
+def _post(url, payload):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    req = urllib.request.Request(url + "/analyze", data=data, method="POST")
+    try:
+        with urllib.request.urlopen(req) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_single_request_from_file(server):
+    code, out = _post(server, {"path": DATA})
+    assert code == 200
+    assert 1.7e-5 < out["mean_m"] < 1.9e-5
+    assert out["n_extrema"] > 0
+
+
+def test_bad_input_returns_400(server):
+    assert _post(server, {"path": "/nonexistent.csv"})[0] == 400
+    assert _post(server, 5)[0] == 400
+    assert _post(server, {"lam_nm": [1, 2, 3]})[0] == 400
+    assert _post(server, b"{not json")[0] == 400
+
+
+@pytest.mark.parametrize("override", [
+    {"substrate_model": "foo"},
+    {"substrate_coeffs": [1.5]},
+    {"lam_min": "x"},
+    {"lam_min": 900, "lam_max": 600},
+    {"window_size": 0},
+    {"min_sep_nm": None},
+])
+def test_bad_settings_return_400(server, override):
+    code, out = _post(server, dict({"path": DATA}, **override))
+    assert code == 400, out
+
+
+def _raw_post(url, headers):
+    host, port = url.rsplit("/", 1)[1].split(":")
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(("POST /analyze HTTP/1.1\r\nHost: x\r\n" + headers
+                      + "\r\n").encode())
+        return sock.recv(4096).split(b" ", 2)[1]
+
+
+def test_bad_content_length(server):
+    assert _raw_post(server, "Content-Length: abc\r\n") == b"400"
+    assert _raw_post(server, "Content-Length: -1\r\n") == b"400"
+    assert _raw_post(server, "") == b"411"
+
+
+def test_keep_alive_latency(server):
+    # Nagle + delayed ACK would add ~40 ms per request on a reused connection
+    lam, T = load_spectrum_csv(DATA)
+    body = json.dumps({"lam_nm": lam.tolist(), "T": T.tolist()})
+    host, port = server.rsplit("/", 1)[1].split(":")
+    conn = http.client.HTTPConnection(host, int(port), timeout=5)
+    lat = []
+    for _ in range(30):
+        t0 = time.perf_counter()
+        conn.request("POST", "/analyze", body,
+                     {"Content-Type": "application/json"})
+        r = conn.getresponse()
+        r.read()
+        lat.append(time.perf_counter() - t0)
+        assert r.status == 200
+    conn.close()
+    assert np.median(lat) < 0.02
+
+
+def test_pipeline_failure_returns_500(server):
+    code, out = _post(server, {"lam_nm": [1.0, 2.0], "T": [0.0, 1.0]})
+    assert code == 500
+    assert "error" in out
+
+
+def test_batch_keeps_per_item_errors(server):
+    code, out = _post(server, [{"path": DATA}, {"path": "/nonexistent.csv"}])
+    assert code == 200
+    assert "mean_m" in out[0]
+    assert "error" in out[1]
+
+
+def test_stats_report_request_and_service_latency(server):
+    _post(server, {"path": DATA})
+    with urllib.request.urlopen(server + "/stats") as r:
+        stats = json.loads(r.read())
+    assert stats["request"]["count"] >= 1
+    assert stats["service"]["count"] >= 1
+    assert stats["request"]["p50_ms"] > 0
+
+
+def test_non_finite_values_become_null():
+    result = {"summary": {"mean_m": np.nan, "std_m": np.inf,
+                          "CI95": (np.nan, 1e-5)},
+              "d2_all_m": np.array([np.nan])}
+    out = summary_to_json(result)
+    assert out["mean_m"] is None and out["std_m"] is None
+    assert out["CI95"] == [None, 1e-5]
+    json.dumps(out, allow_nan=False)
@@ -0,0 +1,48 @@
+import numpy as np
+
+from swanepoel.thickness import thickness_estimate
+
+
+def _thickness_estimate_loop(lam_peaks_nm, n_peaks, lam_valleys_nm, n_valleys,
+                             d1, trials=3):
+    # Reference: per-extremum loop used before the order assignment was vectorised
+    d1 = float(np.mean(d1))
+    lam_all_nm = np.concatenate([lam_peaks_nm, lam_valleys_nm])
+    n_all = np.concatenate([n_peaks, n_valleys])
+    type_flag = np.concatenate([np.ones_like(lam_peaks_nm),
+                                np.zeros_like(lam_valleys_nm)])
+    idx = np.argsort(lam_all_nm)
+    lam_all_nm, n_all, type_flag = lam_all_nm[idx], n_all[idx], type_flag[idx]
+    lam_all_m = lam_all_nm * 1e-9
+    m_raw = 2 * n_all * d1 / lam_all_m
+    m0 = m_raw[0]
+    best_d2, best_var = None, np.inf
+    for m_start in np.arange(np.floor(m0)-trials, np.floor(m0)+trials+1):
+        m_trial = np.zeros_like(m_raw)
+        m_trial[0] = m_start if type_flag[0] == 1 else m_start + 0.5
+        for i in range(1, len(m_raw)):
+            m_expected = m_raw[i] - m_raw[0] + m_trial[0]
+            if type_flag[i] == 1:
+                m_trial[i] = np.round(m_expected)
+            else:
+                m_trial[i] = np.round(m_expected - 0.5) + 0.5
+        d_i = m_trial * lam_all_m / (2 * n_all)
+        var = np.var(d_i)
+        if var < best_var:
+            best_var, best_d2 = var, d_i
+    return best_d2
+
+
+def test_vectorised_order_assignment_matches_loop():
+    rng = np.random.default_rng(1)
+    for _ in range(500):
+        n_pk, n_vl = rng.integers(2, 40, size=2)
+        lam_pk = np.sort(rng.uniform(500.0, 1000.0, n_pk))
+        lam_vl = np.sort(rng.uniform(500.0, 1000.0, n_vl))
+        n_peaks = rng.uniform(1.8, 3.0, n_pk)
+        n_valleys = rng.uniform(1.8, 3.0, n_vl)
+        d1 = rng.uniform(1e-6, 3e-5, 5)
+
+        expected = _thickness_estimate_loop(lam_pk, n_peaks, lam_vl, n_valleys, d1)
+        got = thickness_estimate(lam_pk, n_peaks, lam_vl, n_valleys, d1)
+        np.testing.assert_array_equal(got, expected)